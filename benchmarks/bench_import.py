@@ -0,0 +1,49 @@
+"""Measure the time it takes to `import nobel` in a fresh interpreter.
+
+Compares a bare interpreter, `import nobel` and `import nobel` followed by
+`import requests` (what importing nobel used to cost), and checks that no
+HTTP library is loaded until the first request is made.
+
+Usage: python benchmarks/bench_import.py [runs]
+
+"""
+
+from __future__ import print_function
+import os
+import subprocess
+import sys
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ('bare interpreter', 'pass'),
+    ('import nobel', 'import nobel; nobel.Api()'),
+    ('import nobel + requests', 'import nobel, requests; nobel.Api()'),
+]
+
+
+def timeit(code, runs):
+    best = None
+    for _ in range(runs):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', code], cwd=ROOT)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    for name, code in CASES:
+        print('%-26s %7.1f ms' % (name, timeit(code, runs) * 1000))
+    code = ('import sys, nobel; nobel.Api(); print(sorted(m for m in '
+            '("requests", "urllib2", "urllib.request", "http.client") '
+            'if m in sys.modules))')
+    loaded = subprocess.check_output([sys.executable, '-c', code], cwd=ROOT)
+    print('HTTP modules loaded by import nobel: %s' % loaded.decode().strip())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Compare the binary serialization with JSON re-parsing and pickle.
+
+Uses a synthetic `laureate.json` response shaped like the real one (about 900
+laureates). Reports payload sizes and the time to get `Laureate` objects
+back from each format.
+
+Usage: python benchmarks/bench_serialize.py [runs]
+
+"""
+
+from __future__ import print_function
+import json
+import os
+import pickle
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import nobel  # noqa
+from nobel import serialize  # noqa
+
+
+CATEGORIES = ['physics', 'chemistry', 'medicine', 'literature', 'peace',
+              'economics']
+COUNTRIES = [('USA', 'US'), ('Germany', 'DE'), ('France', 'FR'),
+             ('United Kingdom', 'GB'), ('Sweden', 'SE'), ('Japan', 'JP')]
+
+
+def laureate_json(n=900):
+    random.seed(0)
+    laureates = []
+    for i in range(1, n + 1):
+        country, code = random.choice(COUNTRIES)
+        year = random.randint(1901, 2013)
+        laureates.append({
+            'id': str(i), 'firstname': 'Firstname%d' % i,
+            'surname': 'Surname%d' % i, 'gender': random.choice(['male',
+                                                                 'female']),
+            'born': '%d-0%d-1%d' % (year - random.randint(30, 80),
+                                    random.randint(1, 9),
+                                    random.randint(0, 9)),
+            'died': '0000-00-00', 'bornCountry': country,
+            'bornCountryCode': code, 'bornCity': 'City %d' % i,
+            'diedCountry': country, 'diedCountryCode': code,
+            'diedCity': 'City %d' % i,
+            'prizes': [{'year': str(year),
+                        'category': random.choice(CATEGORIES),
+                        'share': '1',
+                        'motivation': '"for his discoveries in the field '
+                                      'number %d"' % (i % 50),
+                        'affiliations': [{'name': 'University %d' % (i % 40),
+                                          'city': 'City', 'country': country}]
+                        }]
+        })
+    return json.dumps({'laureates': laureates}).encode('utf-8')
+
+
+def best(func, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.time()
+        func()
+        timings.append(time.time() - start)
+    return min(timings) * 1000
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    api = nobel.Api()
+    raw = laureate_json()
+
+    def from_json():
+        data = json.loads(raw.decode('utf-8'))
+        return [api.laureates._parse(d, full=True) for d in data['laureates']]
+
+    laureates = from_json()
+    binary = serialize.dumps(laureates)
+    pickled = pickle.dumps(laureates, pickle.HIGHEST_PROTOCOL)
+
+    print('%-10s %10s %12s' % ('format', 'bytes', 'load (ms)'))
+    print('%-10s %10d %12.1f' % ('json', len(raw), best(from_json, runs)))
+    print('%-10s %10d %12.1f' % (
+        'nobel', len(binary), best(lambda: serialize.loads(binary, api),
+                                   runs)))
+    print('%-10s %10d %12.1f' % (
+        'pickle', len(pickled), best(lambda: pickle.loads(pickled), runs)))
+    print('nobel dumps: %.1f ms' % best(lambda: serialize.dumps(laureates),
+                                        runs))
+
+
+if __name__ == '__main__':
+    main()
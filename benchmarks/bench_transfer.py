@@ -0,0 +1,112 @@
+"""Measure the savings of compressed transfers on slow links.
+
+Serves a synthetic `laureate.json` response (see `bench_serialize`) from a
+local stand-in server which gzips it for clients accepting it and throttles
+its output to simulated bandwidths. Reports the bytes on the wire and the
+time for `api.laureates.all()` with and without compression.
+
+Usage: python benchmarks/bench_transfer.py [runs] [kbit/s ...]
+
+"""
+
+from __future__ import print_function
+import os
+import sys
+import threading
+import time
+import zlib
+
+try:
+    import BaseHTTPServer
+    import SocketServer
+except ImportError:
+    import http.server as BaseHTTPServer
+    import socketserver as SocketServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import nobel  # noqa
+from nobel.transport import RequestsTransport, UrllibTransport  # noqa
+from bench_serialize import laureate_json  # noqa
+
+
+BANDWIDTHS = [256, 1024, 8192]
+
+
+class ThrottledServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, body):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), Handler)
+        self.body = body
+        obj = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self.gzipped = obj.compress(body) + obj.flush()
+        self.bandwidth = None  # bytes per second
+        self.base_url = 'http://127.0.0.1:%d/v1/' % self.server_port
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        body = self.server.body
+        gzipped = 'gzip' in (self.headers.get('Accept-Encoding') or '')
+        if gzipped:
+            body = self.server.gzipped
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        chunk = max(self.server.bandwidth // 20, 1)
+        for i in range(0, len(body), chunk):
+            start = time.time()
+            self.wfile.write(body[i:i + chunk])
+            time.sleep(max(0, 0.05 - (time.time() - start)))
+
+    def log_message(self, *args):
+        pass
+
+
+def best(func, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.time()
+        func()
+        timings.append(time.time() - start)
+    return min(timings) * 1000
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    bandwidths = [int(b) for b in sys.argv[2:]] or BANDWIDTHS
+    server = ThrottledServer(laureate_json())
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    print('%-8s %-9s %-9s %10s %10s %10s' % (
+        'kbit/s', 'transport', 'encoding', 'wire', 'decoded', 'time (ms)'))
+    try:
+        for bandwidth in bandwidths:
+            server.bandwidth = bandwidth * 1024 // 8
+            for name, transport in [
+                    ('requests', RequestsTransport(compression=False)),
+                    ('requests', RequestsTransport()),
+                    ('urllib', UrllibTransport(compression=False)),
+                    ('urllib', UrllibTransport())]:
+                api = nobel.Api(base_url=server.base_url, transport=transport)
+                elapsed = best(api.laureates.all, runs)
+                transfer = api.transfers[-1]
+                print('%-8d %-9s %-9s %10d %10d %10.1f' % (
+                    bandwidth, name, transfer.encoding or 'identity',
+                    transfer.wire_bytes, transfer.decoded_bytes, elapsed))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""Local aggregations.
+
+Column oriented table of awards (one row per laureate and prize) built from
+loaded `Laureate` or `Prize` objects, with group-by aggregations:
+
+   >>> awards = AwardTable(api.laureates.all())
+   >>> awards.group_by('born_country_code', 'decade').count()
+   {(u'US', 1900): 3, (u'US', 1910): 2, ...}
+   >>> awards.group_by('category').mean('age')
+   {u'chemistry': 58.1, u'economics': 66.9, ...}
+
+Only data already present on the objects is used, no requests are made.
+
+"""
+
+__all__ = ['AwardTable', 'GroupBy']
+
+
+class AwardTable(object):
+    """Awards table, stored column by column.
+
+    Rows are identified by `(laureate_id, category, year)`. Merging a row that
+    already exists fills in the values it was missing, so data from partial
+    and full objects can be combined.
+
+    Aggregations are materialized the first time they are computed and
+    updated incrementally as new rows are merged.
+
+    """
+
+    #: Columns taken from the laureate and the prize of each award
+    base_columns = ('laureate_id', 'firstname', 'surname', 'gender', 'born',
+                    'died', 'born_country_code', 'died_country_code',
+                    'category', 'year')
+    #: Columns computed from the base columns
+    derived_columns = ('decade', 'age')
+    columns = base_columns + derived_columns
+
+    def __init__(self, objs=()):
+        self.data = dict((column, []) for column in self.columns)
+        self._rows = {}
+        self._aggregates = {}
+        self.merge(objs)
+
+    def __len__(self):
+        return len(self.data['laureate_id'])
+
+    @staticmethod
+    def _laureate_values(laureate):
+        values = laureate.__dict__
+        row = {'laureate_id': values.get('id')}
+        for column in ('firstname', 'surname', 'gender', 'born', 'died'):
+            row[column] = values.get(column)
+        for column in ('born_country', 'died_country'):
+            country = values.get(column)
+            if country is not None:
+                row[column + '_code'] = country.__dict__.get('code')
+        return row
+
+    @classmethod
+    def _award_rows(cls, obj):
+        values = obj.__dict__
+        if obj.resource == 'laureate':
+            for prize in values.get('prizes') or ():
+                row = cls._laureate_values(obj)
+                row['category'] = prize.__dict__.get('category')
+                row['year'] = prize.__dict__.get('year')
+                yield row
+        elif obj.resource == 'prize':
+            for laureate in values.get('laureates') or ():
+                row = cls._laureate_values(laureate)
+                row['category'] = values.get('category')
+                row['year'] = values.get('year')
+                yield row
+
+    def merge(self, objs):
+        """Add the awards of a sequence of `Laureate` or `Prize` objects."""
+
+        data = self.data
+        start = len(self)
+        updated = False
+        for obj in objs:
+            for row in self._award_rows(obj):
+                key = (row['laureate_id'], row['category'], row['year'])
+                if key in self._rows:
+                    index = self._rows[key]
+                    for column, value in row.items():
+                        if value is not None and \
+                                data[column][index] is None:
+                            data[column][index] = value
+                            updated = True
+                    continue
+                self._rows[key] = len(data['laureate_id'])
+                for column in self.base_columns:
+                    data[column].append(row.get(column))
+
+        self._derive(0 if updated else start)
+        if updated:
+            self._aggregates.clear()
+        else:
+            for spec, state in self._aggregates.items():
+                self._accumulate(state, spec, start)
+
+    def _derive(self, start):
+        """Compute the derived columns from row `start` on."""
+
+        years = self.data['year'][start:]
+        decades = [year - year % 10 if year is not None else None
+                   for year in years]
+        # Prizes are awarded on December 10th
+        ages = [year - born.year - ((born.month, born.day) > (12, 10))
+                if year is not None and born is not None else None
+                for year, born in zip(years, self.data['born'][start:])]
+        self.data['decade'][start:] = decades
+        self.data['age'][start:] = ages
+
+    def _accumulate(self, state, spec, start):
+        """Update an aggregate with the rows from `start` on."""
+
+        keys, op, column = spec
+        if keys:
+            key_columns = [self.data[key][start:] for key in keys]
+            groups = zip(*key_columns) if len(keys) > 1 else key_columns[0]
+        else:
+            groups = [()] * (len(self) - start)
+
+        if op == 'count':
+            for group in groups:
+                state[group] = state.get(group, 0) + 1
+            return
+        for group, value in zip(groups, self.data[column][start:]):
+            if value is None:
+                continue
+            if op == 'mean':
+                total = state.setdefault(group, [0, 0])
+                total[0] += value
+                total[1] += 1
+            elif group not in state:
+                state[group] = value
+            elif op == 'min':
+                state[group] = min(state[group], value)
+            else:
+                state[group] = max(state[group], value)
+
+    def _aggregate(self, keys, op, column=None):
+        if column is not None and column not in self.data:
+            raise ValueError('Unknown column: %s' % column)
+        spec = (keys, op, column)
+        if spec not in self._aggregates:
+            state = {}
+            self._accumulate(state, spec, 0)
+            self._aggregates[spec] = state
+        return self._aggregates[spec]
+
+    def group_by(self, *keys):
+        """Group rows by the values of the given columns."""
+
+        for key in keys:
+            if key not in self.data:
+                raise ValueError('Unknown column: %s' % key)
+        return GroupBy(self, keys)
+
+
+class GroupBy(object):
+    """Grouped awards table.
+
+    Aggregations return a dict mapping each group to its value. Groups are
+    the values of the grouping column, or tuples of values when grouping by
+    several columns. Missing (`None`) values are ignored by `min`, `max` and
+    `mean`.
+
+    """
+
+    def __init__(self, table, keys):
+        self.table = table
+        self.keys = keys
+
+    def count(self):
+        """Number of rows in each group."""
+
+        return dict(self.table._aggregate(self.keys, 'count'))
+
+    def min(self, column):
+        """Minimum value of `column` in each group."""
+
+        return dict(self.table._aggregate(self.keys, 'min', column))
+
+    def max(self, column):
+        """Maximum value of `column` in each group."""
+
+        return dict(self.table._aggregate(self.keys, 'max', column))
+
+    def mean(self, column):
+        """Mean value of `column` in each group."""
+
+        state = self.table._aggregate(self.keys, 'mean', column)
+        return dict((group, total / float(count))
+                    for group, (total, count) in state.items())
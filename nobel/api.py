@@ -1,4 +1,11 @@
-import requests
+import collections
+import threading
+from .transport import get_transport
+
+
+#: Accounting of a request, see `Api.transfers`
+Transfer = collections.namedtuple('Transfer', 'url status_code wire_bytes '
+                                              'decoded_bytes encoding')
 
 
 class NobelError(Exception):
@@ -25,16 +32,46 @@ class Api(object):
     """API wrapper.
 
     If needed, API base url (defaulting to Api.BASE_URL) can be set
-    using the `base_url` optional argument."""
+    using the `base_url` optional argument.
+
+    HTTP requests are performed by a transport (see `nobel.transport`),
+    which can be set using the `transport` optional argument: a `Transport`
+    instance, a transport name (`'requests'` or `'urllib'`) or a callable.
+    Defaults to the `requests` based transport.
+
+    If `index` is true, every object loaded from the API is added to a local
+    search index (see `nobel.search`), available through `search`. A
+    `SearchIndex` instance can also be given.
+
+    Api instances and the objects they create can be shared between
+    threads.
+
+    When the transport reports them, the number of bytes received on the
+    wire and after decompression are added up in `wire_bytes` and
+    `decoded_bytes`, and the last `TRANSFER_LOG_SIZE` requests are kept in
+    `transfers` (as `Transfer` tuples)."""
 
     BASE_URL = 'http://api.nobelprize.org/v1/'
+    TRANSFER_LOG_SIZE = 100
 
-    def __init__(self, base_url=None):
+    def __init__(self, base_url=None, transport=None, index=False):
 
         self.base_url = base_url or self.BASE_URL
+        self.transport = get_transport(transport)
+        if index is True:
+            from .search import SearchIndex
+            index = SearchIndex()
+        elif index is False:
+            index = None
+        self.index = index
         self._prize_class = None
         self._laureate_class = None
         self._country_class = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self.transfers = collections.deque(maxlen=self.TRANSFER_LOG_SIZE)
 
     @staticmethod
     def _unwrap_response(resp):
@@ -59,28 +96,92 @@ class Api(object):
 
     def _get(self, resource, **kwargs):
         url = self.base_url + resource
-        resp = requests.get(url, params=kwargs)
+        resp = self.transport.get(url, kwargs)
+        self._account(url, resp)
         return self._unwrap_response(resp)
 
+    def _account(self, url, resp):
+        wire_bytes = getattr(resp, 'wire_bytes', None)
+        if wire_bytes is None:
+            return
+        decoded_bytes = getattr(resp, 'decoded_bytes', None)
+        with self._lock:
+            self.wire_bytes += wire_bytes
+            self.decoded_bytes += decoded_bytes or 0
+            self.transfers.append(Transfer(url, resp.status_code, wire_bytes,
+                                           decoded_bytes,
+                                           getattr(resp, 'encoding', None)))
+
+    def __getstate__(self):
+        # Only what is needed to rebuild the Api, so that pickled objects
+        # stay small: the search index (if any) starts empty and transfer
+        # accounting starts from zero
+        return {'base_url': self.base_url, 'transport': self.transport,
+                'index': self.index is not None}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def batch(self, max_workers=8):
+        """Return a context manager batching the queries made within it.
+
+        Inside the `with` block (and in the current thread only), `filter`,
+        `get` and `all` return `Deferred` results. Pending queries are sent
+        concurrently on exit or when a result is first needed, see
+        `nobel.batch`.
+
+        """
+
+        from .batch import Batch
+        return Batch(self, max_workers)
+
+    def _current_batch(self):
+        return getattr(self._local, 'batch', None)
+
+    def _loaded(self, objs):
+        """Hook called with every list of objects loaded from the API."""
+
+        if self.index is not None:
+            self.index.add_all(objs)
+
+    def search(self, query, limit=10, resource=None):
+        """Search laureates and prizes loaded so far by name or motivation.
+
+        See `SearchIndex.search`. Requires the API to be created with
+        `index=True`.
+
+        """
+
+        if self.index is None:
+            raise NobelError('Search index not enabled.')
+        return self.index.search(query, limit=limit, resource=resource)
+
     @property
     def prizes(self):
         if self._prize_class is None:
             from .prizes import Prize
-            self._prize_class = type('Prize', (Prize,), dict(api=self))
+            with self._lock:
+                if self._prize_class is None:
+                    self._prize_class = type('Prize', (Prize,),
+                                             dict(api=self))
         return self._prize_class
 
     @property
     def laureates(self):
         if self._laureate_class is None:
             from .laureates import Laureate
-            self._laureate_class = type('Laureate', (Laureate,),
-                                        dict(api=self))
+            with self._lock:
+                if self._laureate_class is None:
+                    self._laureate_class = type('Laureate', (Laureate,),
+                                                dict(api=self))
         return self._laureate_class
 
     @property
     def countries(self):
         if self._country_class is None:
             from .countries import Country
-            self._country_class = type('Country', (Country,),
-                                       dict(api=self))
+            with self._lock:
+                if self._country_class is None:
+                    self._country_class = type('Country', (Country,),
+                                               dict(api=self))
         return self._country_class
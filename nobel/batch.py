@@ -0,0 +1,218 @@
+"""Batched queries.
+
+Within a batch, `filter`, `get` and `all` return `Deferred` results instead
+of querying the API right away. Pending queries are sent together, each in
+its own thread, when the batch ends or when any result is first needed:
+
+   >>> with api.batch():
+   ...     prize = api.prizes.get(year=1921, category='physics')
+   ...     women = api.laureates.filter(gender='female')
+   >>> prize.result()
+   <Prize category="physics" year=1921>
+
+Identical queries are sent once. Prize lookups for the same year and
+different categories are merged into a single query for the whole year and
+split locally (lookups by category alone are not merged, as that would fetch
+every prize). Other lookups cannot be merged, since the API does not accept
+several values for a parameter.
+
+"""
+
+import threading
+
+
+__all__ = ['Batch', 'Deferred']
+
+
+def _text(value):
+    """Return `value` as text, decoding byte strings as UTF-8."""
+
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return unicode(value)
+
+
+class Deferred(object):
+    """Result of a query made within a batch."""
+
+    def __init__(self, batch):
+        self._batch = batch
+        self._done = threading.Event()
+        self._value = None
+        self._error = None
+
+    @property
+    def done(self):
+        """Whether the query has been sent and its result is available."""
+
+        return self._done.is_set()
+
+    def _resolve(self, value=None, error=None):
+        self._value = value
+        self._error = error
+        self._done.set()
+
+    def result(self):
+        """Return the result, sending the pending queries of the batch if
+        needed. Errors are raised as they would be outside a batch."""
+
+        if not self.done:
+            self._batch.dispatch()
+            self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    def __repr__(self):
+        if not self.done:
+            return '<Deferred pending>'
+        return '<Deferred %r>' % (self._error or self._value,)
+
+
+class Batch(object):
+    """Collects queries and sends them concurrently.
+
+    Use through `Api.batch`. `max_workers` bounds the number of queries sent
+    at the same time.
+
+    """
+
+    #: Parameters which can be dropped from queries of each resource and
+    #: applied locally, so that queries differing only in them are merged
+    mergeable = {
+        'prize': ('category',),
+    }
+
+    def __init__(self, api, max_workers=8):
+        self.api = api
+        self.max_workers = max_workers
+        self._pending = []
+        self._lock = threading.Lock()
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = self.api._current_batch()
+        self.api._local.batch = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.api._local.batch = self._previous
+        if exc_type is None:
+            self.dispatch()
+
+    def add(self, cls, build, fields, params):
+        """Add a query, returning its `Deferred` result."""
+
+        deferred = Deferred(self)
+        with self._lock:
+            self._pending.append((cls, build, fields, params, deferred))
+        return deferred
+
+    def _plan(self, pending):
+        """Group pending queries.
+
+        Returns a dict mapping each query to send, as `(resource, params)`
+        with sorted params (as strings), to a list of `(entry, local)` pairs,
+        where `local` are the params to apply locally to the response, if
+        any.
+
+        """
+
+        queries = {}
+        for entry in pending:
+            cls, build, fields, params, deferred = entry
+            # Values are sent as strings, so year=1921 and year='1921' are
+            # the same query
+            key = (cls.resource, tuple(sorted((k, _text(v))
+                                              for k, v in params.items())))
+            queries.setdefault(key, []).append(entry)
+
+        merges = {}
+        for key in queries:
+            resource, params = key
+            mergeable = self.mergeable.get(resource, ())
+            rest = tuple(param for param in params
+                         if param[0] not in mergeable)
+            # Merging into a query without parameters would fetch everything
+            if rest and rest != params:
+                merges.setdefault((resource, rest), []).append(key)
+
+        plan = dict((key, [(entry, None) for entry in entries])
+                    for key, entries in queries.items())
+        for merged, keys in merges.items():
+            if len(keys) < 2:
+                continue
+            entries = plan.setdefault(merged, [])
+            for key in keys:
+                local = tuple(param for param in key[1]
+                              if param not in merged[1])
+                entries.extend((entry, local) for entry, _ in plan.pop(key))
+        return plan
+
+    def _send(self, plan, queries, responses):
+        while True:
+            with self._lock:
+                if not queries:
+                    return
+                resource, params = key = queries.pop()
+            # Send the values as given in the first query, as outside a batch
+            names = set(name for name, value in params)
+            entry, local = plan[key][0]
+            params = dict((name, value) for name, value in entry[3].items()
+                          if name in names)
+            try:
+                responses[key] = (self.api._get(resource + '.json',
+                                                **params), None)
+            except Exception as e:
+                responses[key] = (None, e)
+
+    @staticmethod
+    def _select(cls, data, local):
+        # The API matches values regardless of case
+        rows = [row for row in data[cls.resource_plural]
+                if all(_text(row.get(k)).lower() == _text(v).lower()
+                       for k, v in local)]
+        return {cls.resource_plural: rows}
+
+    def dispatch(self):
+        """Send all pending queries and resolve their results."""
+
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        try:
+            self._dispatch(pending)
+        except Exception as e:
+            # Results must not be left pending, or result() would block
+            for cls, build, fields, params, deferred in pending:
+                if not deferred.done:
+                    deferred._resolve(error=e)
+
+    def _dispatch(self, pending):
+        plan = self._plan(pending)
+        queries = list(plan)
+        responses = {}
+        workers = [threading.Thread(target=self._send,
+                                    args=(plan, queries, responses))
+                   for i in range(min(self.max_workers, len(queries)) - 1)]
+        for worker in workers:
+            worker.start()
+        self._send(plan, queries, responses)
+        for worker in workers:
+            worker.join()
+
+        for key, entries in plan.items():
+            data, error = responses[key]
+            for (cls, build, fields, params, deferred), local in entries:
+                if error is not None:
+                    deferred._resolve(error=error)
+                    continue
+                try:
+                    if local is None:
+                        deferred._resolve(build(data, fields))
+                    else:
+                        deferred._resolve(build(self._select(cls, data, local),
+                                                fields))
+                except Exception as e:
+                    deferred._resolve(error=e)
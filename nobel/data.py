@@ -1,6 +1,7 @@
 import datetime
 import re
 import sys
+import threading
 from .api import NotFoundError, MultipleObjectsError
 
 
@@ -40,22 +41,53 @@ class NobelObject(object):
         return "".join(next(camel)(x) if x else '_' for x in name.split("_"))
 
     @classmethod
-    def _parse(cls, data, full=False):
+    def _parse(cls, data, full=False, fields=None):
         """Factory method.
 
         Parses JSON data and returns resource instance. Attributes must be
         defined in the `attributes` class attribute. Takes care of conversion
         from Nobel API mixedCase to friendlier lower_case_with_underscores.
 
+        If given, only the attributes in `fields` are parsed (see `_fields`).
+        They are kept in `_parsed`, so that attributes of the projection
+        missing from the data are not loaded on access.
+
         """
 
+        wanted = cls.attributes if fields is None else fields
         obj = cls()
         for attr in data:
-            if cls._uncamelize(attr) in cls.attributes:
-                setattr(obj, cls._uncamelize(attr), data[attr])
+            name = cls._uncamelize(attr)
+            if name in wanted:
+                setattr(obj, name, data[attr])
         obj.full = full
+        if fields is not None:
+            obj._parsed = fields
         return obj
 
+    @classmethod
+    def _fields(cls, only=None, defer=None):
+        """Return the attributes to parse for a field projection.
+
+        `only` restricts parsing to the given attributes and `defer` excludes
+        the given ones. Attributes in `unique_together` are always parsed, so
+        that the rest can be loaded on access. Returns `None` when no
+        projection is needed.
+
+        """
+
+        if only is None and defer is None:
+            return None
+        for name in tuple(only or ()) + tuple(defer or ()):
+            if name not in cls.attributes:
+                raise ValueError('Unknown field: %s' % name)
+        fields = set(cls.attributes if only is None else only)
+        fields.difference_update(defer or ())
+        fields.update(cls.unique_together)
+        if fields.issuperset(cls.attributes):
+            return None
+        return frozenset(fields)
+
     @staticmethod
     def _parse_date(data):
         """Convert a string date into a proper Python datetime."""
@@ -66,7 +98,7 @@ class NobelObject(object):
             return None
 
     @classmethod
-    def filter(cls, **kwargs):
+    def filter(cls, only=None, defer=None, **kwargs):
         """Filter objects.
 
         Returns a list of resource instances filtered by the arguments passed,
@@ -74,43 +106,91 @@ class NobelObject(object):
         the Nobel API. Conversion from Nobel API mixedCase to friendlier
         lower_case_with_underscores and vice versa is automatic.
 
+        Parsing can be restricted to some attributes with `only`, or skip
+        some with `defer`. The rest are loaded from the server on access.
+
+        Within a batch (see `Api.batch`) a `Deferred` result is returned
+        instead.
+
         """
 
-        camel_kwargs = dict((cls._camelize(k), v) for k, v in kwargs.items())
-        data = cls.api._get(cls.resource + '.json', **camel_kwargs)
-        return [cls._parse(p, full=True) for p in data[cls.resource_plural]]
+        return cls._query(cls._from_filter, cls._fields(only, defer), kwargs,
+                          cls.api._current_batch())
 
     @classmethod
-    def all(cls):
+    def all(cls, only=None, defer=None):
         """List all objects.
 
-        Returns a list of all resource instances.
+        Returns a list of all resource instances. See `filter` for `only` and
+        `defer`.
 
         """
-        return cls.filter()
+        return cls.filter(only=only, defer=defer)
 
     @classmethod
-    def get(cls, **kwargs):
+    def get(cls, only=None, defer=None, **kwargs):
         """Get a single object.
 
         Return a single resource instance univocally defined by the arguments
-        passed. See the `unique_together` attribute.
+        passed. See the `unique_together` attribute, and `filter` for `only`,
+        `defer` and batches.
 
         """
 
+        return cls._query(cls._from_get, cls._fields(only, defer), kwargs,
+                          cls.api._current_batch())
+
+    @classmethod
+    def _query(cls, build, fields, kwargs, batch=None):
+        """Query the API and build the result from the response data with
+        `build(data, fields)`, or add the query to `batch` if given."""
+
         camel_kwargs = dict((cls._camelize(k), v) for k, v in kwargs.items())
+        if batch is not None:
+            return batch.add(cls, build, fields, camel_kwargs)
         data = cls.api._get(cls.resource + '.json', **camel_kwargs)
+        return build(data, fields)
+
+    @classmethod
+    def _from_filter(cls, data, fields=None):
+        objs = [cls._parse(p, full=fields is None, fields=fields)
+                for p in data[cls.resource_plural]]
+        cls.api._loaded(objs)
+        return objs
+
+    @classmethod
+    def _parse_one(cls, data, fields=None):
         if len(data[cls.resource_plural]) == 0:
             raise NotFoundError('No resources found.')
         elif len(data[cls.resource_plural]) > 1:
             raise MultipleObjectsError('Multiple objects returned when only '
                                        'one was expected.')
-        obj = cls._parse(data[cls.resource_plural][0], full=True)
+        return cls._parse(data[cls.resource_plural][0], full=fields is None,
+                          fields=fields)
+
+    @classmethod
+    def _from_get(cls, data, fields=None):
+        obj = cls._parse_one(data, fields)
+        cls.api._loaded([obj])
         return obj
 
     def __init__(self):
         self.full = False
 
+    def _hydration_lock(self):
+        """Return the lock serializing updates of this instance.
+
+        Created on first use, most instances are never updated.
+
+        """
+
+        lock = self.__dict__.get('_lock')
+        if lock is None:
+            # dict.setdefault is atomic, so concurrent callers get the same
+            # lock
+            lock = self.__dict__.setdefault('_lock', threading.RLock())
+        return lock
+
     def _update(self):
         """Update object data.
 
@@ -121,12 +201,30 @@ class NobelObject(object):
 
         """
 
-        obj = self.__class__.get(**dict([(field, self.__getattribute__(field))
-                                         for field in self.unique_together]))
+        # Not batched, attributes are needed right away. The fetched object
+        # is thrown away, so this instance is the one passed to `_loaded`.
+        cls = self.__class__
+        obj = cls._query(cls._parse_one, None,
+                         dict([(field, self.__getattribute__(field))
+                               for field in self.unique_together]))
         for attribute in self.__class__.attributes:
             if hasattr(obj, attribute):
                 self.__setattr__(attribute, obj.__getattribute__(attribute))
         self.full = True
+        cls.api._loaded([self])
+
+    def __reduce__(self):
+        """Pickle support.
+
+        Objects are pickled along with their `Api`, and restored as instances
+        of the corresponding class of the unpickled `Api`.
+
+        """
+
+        if self.api is None:
+            return object.__reduce__(self)
+        state = dict((k, v) for k, v in self.__dict__.items() if k != '_lock')
+        return _restore, (self.api, self.resource_plural, state)
 
     def __str__(self):
         return unicode(self).encode('utf-8')
@@ -152,10 +250,29 @@ class NobelObject(object):
 
     def __getattr__(self, name):
         """Updates instance with fresh data from the server if a well-known
-        but undefined attribute is accessed."""
+        but undefined attribute is accessed.
+
+        Attributes parsed from a projection (see `_parse`) are not loaded
+        again: if undefined, the API didn't return them.
+
+        When several threads access undefined attributes of the same instance
+        at once, only one of them updates it while the others wait.
+
+        """
 
         if name == 'full':
             self.full = False
-        if not self.full and name in self.__class__.attributes:
-            self._update()
+        if not self.full and name in self.__class__.attributes and \
+                name not in self.__dict__.get('_parsed', ()):
+            with self._hydration_lock():
+                if not self.full:
+                    self._update()
         return self.__getattribute__(name)
+
+
+def _restore(api, resource_plural, state):
+    """Restore a pickled object, see `NobelObject.__reduce__`."""
+
+    obj = getattr(api, resource_plural)()
+    obj.__dict__.update(state)
+    return obj
@@ -15,18 +15,20 @@ class Laureate(NobelObject):
     resource_plural = 'laureates'
 
     @classmethod
-    def _parse(cls, data, full=False):
-        obj = super(Laureate, cls)._parse(data, full)
+    def _parse(cls, data, full=False, fields=None):
+        obj = super(Laureate, cls)._parse(data, full, fields)
+        wanted = cls.attributes if fields is None else fields
         obj.id = int(data['id'])
-        if 'born' in data:
+        if 'born' in data and 'born' in wanted:
             obj.born = cls._parse_date(data['born'])
-        if 'died' in data:
+        if 'died' in data and 'died' in wanted:
             obj.died = cls._parse_date(data['died'])
-        if 'prizes' in data:
+        if 'prizes' in data and 'prizes' in wanted:
             obj.prizes = [cls.api.prizes._parse(p, full=False)
                           for p in data['prizes']]
         for country_field in ('born_country', 'died_country'):
-            if cls._camelize(country_field) in data and \
+            if country_field in wanted and \
+               cls._camelize(country_field) in data and \
                cls._camelize(country_field + '_code') in data:
                 country = cls.api.countries()
                 country.name = data[cls._camelize(country_field)]
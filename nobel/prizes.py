@@ -13,12 +13,14 @@ class Prize(NobelObject):
     resource_plural = 'prizes'
 
     @classmethod
-    def _parse(cls, data, full=False):
-        obj = super(Prize, cls)._parse(data, full)
+    def _parse(cls, data, full=False, fields=None):
+        obj = super(Prize, cls)._parse(data, full, fields)
+        wanted = cls.attributes if fields is None else fields
         obj.year = int(data['year'])
-        if 'laureates' in data:
+        if 'laureates' in data and 'laureates' in wanted:
             obj.laureates = [cls.api.laureates._parse(l, full=False)
                              for l in data['laureates']]
+        if 'laureates' in data and 'motivation' in wanted:
             if 'motivation' in data['laureates'][0]:
                 obj.motivation = data['laureates'][0]['motivation']
 
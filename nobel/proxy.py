@@ -0,0 +1,243 @@
+"""Local caching proxy for the Nobel API.
+
+Serves `prize.json`, `laureate.json` and `country.json` by forwarding the
+requests to the upstream API and caching the successful responses, so that
+many processes can share a single cache:
+
+   $ python -m nobel.proxy --port 8000
+
+   >>> api = nobel.Api(base_url='http://localhost:8000/v1/')
+
+Concurrent requests for the same query while it is being fetched wait for
+that single upstream request instead of issuing their own. Expired responses
+are dropped as new ones are stored, and the number of cached responses is
+capped. Cache statistics are served as JSON at `/stats.json`.
+
+"""
+
+import BaseHTTPServer
+import SocketServer
+import json
+import optparse
+import threading
+import time
+import urlparse
+from .api import Api
+from .transport import get_transport
+
+
+__all__ = ['ProxyCache', 'make_server', 'main']
+
+
+RESOURCES = ('prize.json', 'laureate.json', 'country.json')
+
+
+def _body(resp):
+    """Return the raw body of a transport response."""
+
+    content = getattr(resp, 'content', None)
+    if isinstance(content, unicode):
+        return content.encode('utf-8')
+    if isinstance(content, bytes):
+        return content
+    return json.dumps(resp.json()).encode('utf-8')
+
+
+class _Fetch(object):
+    """Upstream request in progress."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class ProxyCache(object):
+    """Read-through cache of upstream API responses.
+
+    Successful responses are kept for `ttl` seconds (0 disables caching),
+    and at most `max_entries` of them: when full, the response expiring the
+    soonest is evicted. Upstream requests are made through `transport`, as
+    in `Api`.
+
+    """
+
+    def __init__(self, upstream=None, transport=None, ttl=3600,
+                 max_entries=1000):
+        self.upstream = upstream or Api.BASE_URL
+        self.transport = get_transport(transport)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(('requests', 'hits', 'misses',
+                                     'collapsed', 'upstream_errors',
+                                     'evictions'), 0)
+
+    def _fetch(self, resource, params):
+        try:
+            resp = self.transport.get(self.upstream + resource, params)
+            return resp.status_code, _body(resp)
+        except Exception as e:
+            with self._lock:
+                self._stats['upstream_errors'] += 1
+            return 502, json.dumps({'error': 'Upstream error: %s' % e})
+
+    def get(self, resource, params):
+        """Return the `(status_code, body)` response for a query."""
+
+        key = (resource, tuple(sorted(params.items())))
+        with self._lock:
+            self._stats['requests'] += 1
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._stats['hits'] += 1
+                return entry[1:]
+            fetch = self._pending.get(key)
+            leader = fetch is None
+            if leader:
+                self._stats['misses'] += 1
+                fetch = self._pending[key] = _Fetch()
+            else:
+                self._stats['collapsed'] += 1
+
+        if not leader:
+            fetch.done.wait()
+            return fetch.result
+
+        fetch.result = self._fetch(resource, params)
+        with self._lock:
+            del self._pending[key]
+            if fetch.result[0] == 200 and self.ttl > 0:
+                self._store(key, fetch.result)
+        fetch.done.set()
+        return fetch.result
+
+    def _store(self, key, result):
+        """Cache a response, evicting expired entries first and then the
+        one expiring the soonest if full. Must be called with the lock
+        held."""
+
+        now = time.time()
+        expired = [k for k, entry in self._entries.items() if entry[0] <= now]
+        for k in expired:
+            del self._entries[k]
+        evictions = len(expired)
+        while self._entries and key not in self._entries and \
+                len(self._entries) >= self.max_entries:
+            oldest = min(self._entries, key=lambda k: self._entries[k][0])
+            del self._entries[oldest]
+            evictions += 1
+        self._stats['evictions'] += evictions
+        if self.max_entries > 0:
+            self._entries[key] = (now + self.ttl,) + result
+
+    def stats(self):
+        """Return cache statistics.
+
+        Collapsed requests (those which waited for an upstream request already
+        in progress) count as hits for the hit rate.
+
+        """
+
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['pending'] = len(self._pending)
+        served = stats['hits'] + stats['collapsed']
+        stats['hit_rate'] = float(served) / stats['requests'] \
+            if stats['requests'] else 0.0
+        return stats
+
+    def clear(self):
+        """Drop all cached responses."""
+
+        with self._lock:
+            self._entries.clear()
+
+
+class ProxyHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Request handler serving from the server's `cache`."""
+
+    def do_GET(self):
+        url = urlparse.urlparse(self.path)
+        resource = url.path.rsplit('/', 1)[-1]
+        if resource == 'stats.json':
+            code = 200
+            body = json.dumps(self.server.cache.stats())
+        elif resource in RESOURCES:
+            params = dict(urlparse.parse_qsl(url.query))
+            code, body = self.server.cache.get(resource, params)
+        else:
+            code = 404
+            body = json.dumps({'error': 'Unknown resource.'})
+        if isinstance(body, unicode):
+            body = body.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format,
+                                                              *args)
+
+
+class ProxyServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """HTTP server handling each connection in its own thread."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, address, cache, verbose=False):
+        BaseHTTPServer.HTTPServer.__init__(self, address, ProxyHandler)
+        self.cache = cache
+        self.verbose = verbose
+
+
+def make_server(host='127.0.0.1', port=8000, cache=None, verbose=False):
+    """Return a proxy server bound to `host` and `port`.
+
+    Use port 0 to bind to any free port (see `server_port`).
+
+    """
+
+    return ProxyServer((host, port), cache or ProxyCache(), verbose)
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='python -m nobel.proxy [options]')
+    parser.add_option('--host', default='127.0.0.1',
+                      help='address to listen on [%default]')
+    parser.add_option('--port', type='int', default=8000,
+                      help='port to listen on [%default]')
+    parser.add_option('--upstream', default=Api.BASE_URL,
+                      help='upstream API base url [%default]')
+    parser.add_option('--ttl', type='int', default=3600,
+                      help='seconds to cache responses, 0 to disable '
+                           '[%default]')
+    parser.add_option('--max-entries', type='int', default=1000,
+                      help='maximum number of cached responses [%default]')
+    parser.add_option('--transport', default='requests',
+                      help='transport for upstream requests [%default]')
+    parser.add_option('-v', '--verbose', action='store_true', default=False,
+                      help='log every request')
+    options, args = parser.parse_args(argv)
+
+    cache = ProxyCache(options.upstream, options.transport, options.ttl,
+                       options.max_entries)
+    server = make_server(options.host, options.port, cache, options.verbose)
+    print('Serving the Nobel API on http://%s:%d/v1/' % server.server_address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""Local search index.
+
+In-memory full-text index over laureate names and prize motivations, with
+prefix and typo tolerant matching. Tokens are kept in an inverted index and
+misspellings are resolved by comparing the trigrams of the query tokens with
+those of the indexed tokens.
+
+   >>> api = nobel.Api(index=True)
+   >>> laureates = api.laureates.all()
+   >>> api.search('einstien')
+   [<Laureate id=26>]
+
+"""
+
+import bisect
+import re
+import threading
+import unicodedata
+
+
+__all__ = ['SearchIndex', 'tokenize']
+
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Split text into lowercase tokens stripped of accents."""
+
+    if not text:
+        return []
+    if not isinstance(text, unicode):
+        text = text.decode('utf-8')
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = u''.join(c for c in text if not unicodedata.combining(c))
+    return _TOKEN_RE.findall(text)
+
+
+def trigrams(token):
+    """Return the set of trigrams of a token, padded to weight its start."""
+
+    padded = u'  %s ' % token
+    return set(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class SearchIndex(object):
+    """Inverted token index with trigram based fuzzy matching.
+
+    Objects are added with `add`, which also indexes the objects nested in
+    them (the laureates of a prize and vice versa). Adding an object already
+    in the index replaces it, unless the new one is partial and the old one
+    is not.
+
+    Only attributes already present on the objects are indexed, no data is
+    ever fetched from the API. Indexes can be shared between threads.
+
+    """
+
+    #: Indexed attributes and their weights, per resource
+    fields = {
+        'laureate': (('firstname', 1.0), ('surname', 1.0)),
+        'prize': (('motivation', 0.5),),
+    }
+
+    EXACT_SCORE = 1.0
+    PREFIX_SCORE = 0.8
+    FUZZY_SCORE = 0.6
+
+    def __init__(self, fuzzy_threshold=0.3):
+        self.fuzzy_threshold = fuzzy_threshold
+        self._objects = {}
+        self._doc_tokens = {}
+        self._postings = {}
+        self._trigrams = {}
+        self._ngram_counts = {}
+        self._tokens = []
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._objects)
+
+    @staticmethod
+    def _key(obj):
+        values = tuple(obj.__dict__.get(field)
+                       for field in obj.unique_together)
+        if None in values:
+            return None
+        return (obj.resource,) + values
+
+    def _add_token(self, token):
+        self._postings[token] = {}
+        bisect.insort(self._tokens, token)
+        grams = trigrams(token)
+        self._ngram_counts[token] = len(grams)
+        for gram in grams:
+            self._trigrams.setdefault(gram, set()).add(token)
+
+    def _remove_token(self, token):
+        del self._postings[token]
+        del self._tokens[bisect.bisect_left(self._tokens, token)]
+        del self._ngram_counts[token]
+        for gram in trigrams(token):
+            self._trigrams[gram].discard(token)
+            if not self._trigrams[gram]:
+                del self._trigrams[gram]
+
+    def _unindex(self, key):
+        for token in self._doc_tokens.pop(key, ()):
+            postings = self._postings[token]
+            del postings[key]
+            if not postings:
+                self._remove_token(token)
+
+    def add(self, obj):
+        """Index an object and the objects nested in it."""
+
+        with self._lock:
+            self._add(obj)
+
+    def _add(self, obj):
+        for nested in ('prizes', 'laureates'):
+            for child in obj.__dict__.get(nested) or ():
+                self._add(child)
+        if obj.resource not in self.fields:
+            return
+        key = self._key(obj)
+        if key is None:
+            return
+        old = self._objects.get(key)
+        if old is not None and old.full and not obj.full:
+            return
+
+        weights = {}
+        for attribute, weight in self.fields[obj.resource]:
+            for token in tokenize(obj.__dict__.get(attribute)):
+                weights[token] = max(weights.get(token, 0), weight)
+        self._unindex(key)
+        self._objects[key] = obj
+        self._doc_tokens[key] = weights
+        for token, weight in weights.items():
+            if token not in self._postings:
+                self._add_token(token)
+            self._postings[token][key] = weight
+
+    def add_all(self, objs):
+        """Index a sequence of objects."""
+
+        with self._lock:
+            for obj in objs:
+                self._add(obj)
+
+    def _expand(self, query_token):
+        """Return a dict of index tokens matching `query_token` and their
+        scores."""
+
+        matches = {}
+        start = bisect.bisect_left(self._tokens, query_token)
+        for token in self._tokens[start:]:
+            if not token.startswith(query_token):
+                break
+            if token == query_token:
+                matches[token] = self.EXACT_SCORE
+            else:
+                matches[token] = self.PREFIX_SCORE * (
+                    0.5 + 0.5 * len(query_token) / float(len(token)))
+
+        if len(query_token) < 3:
+            return matches
+        grams = trigrams(query_token)
+        shared = {}
+        for gram in grams:
+            for token in self._trigrams.get(gram, ()):
+                shared[token] = shared.get(token, 0) + 1
+        for token, count in shared.items():
+            similarity = count / float(
+                len(grams) + self._ngram_counts[token] - count)
+            if similarity >= self.fuzzy_threshold:
+                score = self.FUZZY_SCORE * similarity
+                matches[token] = max(matches.get(token, 0), score)
+        return matches
+
+    def search(self, query, limit=10, resource=None):
+        """Search the index.
+
+        Returns a list of at most `limit` objects ranked by relevance.
+        Objects matching more of the query tokens rank first. Results can be
+        restricted to a resource ('laureate' or 'prize').
+
+        """
+
+        with self._lock:
+            scores, hits = self._score(tokenize(query), resource)
+            ranked = sorted(scores, key=lambda key: (-hits[key],
+                                                     -scores[key], key))
+            return [self._objects[key] for key in ranked[:limit]]
+
+    def _score(self, query_tokens, resource):
+        scores = {}
+        hits = {}
+        for query_token in set(query_tokens):
+            best = {}
+            for token, score in self._expand(query_token).items():
+                for key, weight in self._postings[token].items():
+                    if resource is not None and key[0] != resource:
+                        continue
+                    best[key] = max(best.get(key, 0), score * weight)
+            for key, score in best.items():
+                scores[key] = scores.get(key, 0) + score
+                hits[key] = hits.get(key, 0) + 1
+        return scores, hits
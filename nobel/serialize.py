@@ -0,0 +1,237 @@
+"""Compact binary serialization of Nobel objects.
+
+Serializes any combination of lists, strings, numbers, dates and `Prize`,
+`Laureate` and `Country` objects into a compact binary format, keeping shared
+references, and the `full` flag and parsed projection (see
+`NobelObject._parse`) of every object. Objects are attached to the given `Api`
+when loaded:
+
+   >>> data = serialize.dumps(api.laureates.all())
+   >>> laureates = serialize.loads(data, api)
+
+Format: a 4 bytes header followed by the object table and the root value.
+Integers are written as zigzag varints and strings are written once and
+referenced by index afterwards. Values are prefixed by a one byte tag.
+
+"""
+
+import datetime
+import struct
+from .data import NobelObject
+
+
+__all__ = ['dumps', 'loads', 'dump', 'load', 'SerializationError']
+
+
+MAGIC = b'NBL\x02'
+
+RESOURCES = ('prizes', 'laureates', 'countries')
+
+NONE, TRUE, FALSE, INT, FLOAT, STRING, STRING_REF, DATE, LIST, OBJECT = \
+    range(10)
+
+
+class SerializationError(ValueError):
+    """Invalid or unsupported serialized data."""
+
+
+class _Writer(object):
+
+    def __init__(self):
+        self.buf = bytearray(MAGIC)
+        self.strings = {}
+        self.objects = {}
+        self.order = []
+
+    def varint(self, n):
+        while n > 0x7f:
+            self.buf.append((n & 0x7f) | 0x80)
+            n >>= 7
+        self.buf.append(n)
+
+    def string(self, value):
+        index = self.strings.get(value)
+        if index is not None:
+            self.buf.append(STRING_REF)
+            self.varint(index)
+            return
+        self.strings[value] = len(self.strings)
+        encoded = value.encode('utf-8')
+        self.buf.append(STRING)
+        self.varint(len(encoded))
+        self.buf.extend(encoded)
+
+    def collect(self, value):
+        """Assign an index to every object reachable from `value`."""
+
+        stack = [value]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, (list, tuple)):
+                stack.extend(reversed(value))
+            elif isinstance(value, NobelObject) and \
+                    id(value) not in self.objects:
+                self.objects[id(value)] = len(self.order)
+                self.order.append(value)
+                stack.extend(reversed(list(_state(value).values())))
+
+    def value(self, value):
+        if value is None:
+            self.buf.append(NONE)
+        elif value is True:
+            self.buf.append(TRUE)
+        elif value is False:
+            self.buf.append(FALSE)
+        elif isinstance(value, (int, long)):
+            self.buf.append(INT)
+            self.varint(value << 1 if value >= 0 else (-value << 1) - 1)
+        elif isinstance(value, float):
+            self.buf.append(FLOAT)
+            self.buf.extend(struct.pack('>d', value))
+        elif isinstance(value, basestring):
+            if not isinstance(value, unicode):
+                value = value.decode('utf-8')
+            self.string(value)
+        elif isinstance(value, datetime.date):
+            self.buf.append(DATE)
+            self.varint(value.toordinal())
+        elif isinstance(value, (list, tuple)):
+            self.buf.append(LIST)
+            self.varint(len(value))
+            for item in value:
+                self.value(item)
+        elif id(value) in self.objects:
+            self.buf.append(OBJECT)
+            self.varint(self.objects[id(value)])
+        else:
+            raise SerializationError('Cannot serialize %r' % (value,))
+
+
+class _Reader(object):
+
+    def __init__(self, data):
+        self.buf = bytearray(data)
+        self.pos = len(MAGIC)
+        self.strings = []
+        self.objects = []
+        if self.buf[:self.pos] != bytearray(MAGIC):
+            raise SerializationError('Not a serialized Nobel object.')
+
+    def varint(self):
+        n = shift = 0
+        buf = self.buf
+        while True:
+            byte = buf[self.pos]
+            self.pos += 1
+            n |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return n
+            shift += 7
+
+    def take(self, size):
+        """Return the next `size` bytes."""
+
+        if self.pos + size > len(self.buf):
+            raise SerializationError('Truncated serialized data.')
+        self.pos += size
+        return self.buf[self.pos - size:self.pos]
+
+    def value(self):
+        tag = self.buf[self.pos]
+        self.pos += 1
+        if tag == NONE:
+            return None
+        elif tag == TRUE:
+            return True
+        elif tag == FALSE:
+            return False
+        elif tag == INT:
+            n = self.varint()
+            return n >> 1 if not n & 1 else -((n + 1) >> 1)
+        elif tag == FLOAT:
+            return struct.unpack('>d', bytes(self.take(8)))[0]
+        elif tag == STRING:
+            value = self.take(self.varint()).decode('utf-8')
+            self.strings.append(value)
+            return value
+        elif tag == STRING_REF:
+            return self.strings[self.varint()]
+        elif tag == DATE:
+            return datetime.date.fromordinal(self.varint())
+        elif tag == LIST:
+            return [self.value() for i in range(self.varint())]
+        elif tag == OBJECT:
+            return self.objects[self.varint()]
+        raise SerializationError('Unknown tag: %d' % tag)
+
+
+def _state(obj):
+    """Return the attributes of an object worth serializing."""
+
+    return dict((k, v) for k, v in obj.__dict__.items()
+                if k != 'full' and not k.startswith('_'))
+
+
+def dumps(value):
+    """Serialize a value (typically a list of objects) to bytes."""
+
+    writer = _Writer()
+    writer.collect(value)
+    writer.varint(len(writer.order))
+    # Object classes and flags first, so that objects can be created before
+    # their attributes (which may reference them) are read.
+    for obj in writer.order:
+        writer.string(unicode(obj.resource_plural))
+        writer.value(bool(obj.__dict__.get('full')))
+        parsed = obj.__dict__.get('_parsed')
+        writer.value(None if parsed is None else sorted(parsed))
+    for obj in writer.order:
+        state = _state(obj)
+        writer.varint(len(state))
+        for name in sorted(state):
+            writer.string(unicode(name))
+            writer.value(state[name])
+    writer.value(value)
+    return bytes(writer.buf)
+
+
+def loads(data, api):
+    """Deserialize bytes created by `dumps`, attaching objects to `api`."""
+
+    reader = _Reader(data)
+    try:
+        count = reader.varint()
+        flags = []
+        for i in range(count):
+            resource = reader.value()
+            if resource not in RESOURCES:
+                raise SerializationError('Unknown resource: %s' % resource)
+            obj = getattr(api, resource)()
+            flags.append(reader.value())
+            parsed = reader.value()
+            if parsed is not None:
+                obj._parsed = frozenset(parsed)
+            reader.objects.append(obj)
+        for obj, full in zip(reader.objects, flags):
+            for i in range(reader.varint()):
+                name = str(reader.value())
+                setattr(obj, name, reader.value())
+            obj.full = full
+        value = reader.value()
+    except (IndexError, UnicodeDecodeError, struct.error):
+        raise SerializationError('Corrupt serialized data.')
+    if reader.pos != len(reader.buf):
+        raise SerializationError('Trailing data after serialized value.')
+    return value
+
+
+def dump(value, fp):
+    """Serialize a value to a binary file object."""
+
+    fp.write(dumps(value))
+
+
+def load(fp, api):
+    """Deserialize from a binary file object, attaching objects to `api`."""
+
+    return loads(fp.read(), api)
@@ -1,6 +1,15 @@
 # -*- coding: utf-8 -*-
+import BaseHTTPServer
+import SocketServer
 import datetime
+import json
+import os
+import subprocess
 import sys
+import threading
+import time
+import urlparse
+import zlib
 import mock
 import pytest
 import nobel
@@ -10,6 +19,75 @@ from nobel.countries import Country
 from nobel.api import NobelError, NotFoundError, MultipleObjectsError, \
     ServiceUnavailable, BadRequest
 from nobel.data import NobelObject
+from nobel.aggregate import AwardTable
+from nobel.batch import Batch, Deferred
+from nobel.proxy import ProxyCache, make_server
+from nobel.search import tokenize
+from nobel import serialize
+from nobel.transport import Response, Transport, RequestsTransport, \
+    UrllibTransport, CallableTransport, accept_encoding, read_body
+
+
+def gzip_compress(data):
+    obj = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return obj.compress(data) + obj.flush()
+
+
+class LocalServer(object):
+    """Local stand-in for the Nobel API, serving canned JSON responses.
+
+    `responses` maps resource names (e.g. 'laureate.json') to callables
+    taking the query parameters dict and returning `(status_code, data)`.
+    If `compress` is true, bodies are gzipped for clients accepting it.
+
+    """
+
+    def __init__(self, responses, compress=False):
+        self.responses = responses
+        self.requests = []
+        self.accept_encodings = []
+        server = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse.urlparse(self.path)
+                params = dict(urlparse.parse_qsl(url.query))
+                resource = url.path.rsplit('/', 1)[-1]
+                server.requests.append((resource, params))
+                server.accept_encodings.append(
+                    self.headers.get('Accept-Encoding'))
+                code, data = server.responses[resource](params)
+                body = json.dumps(data).encode('utf-8')
+                gzipped = compress and 'gzip' in (
+                    server.accept_encodings[-1] or '')
+                if gzipped:
+                    body = gzip_compress(body)
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                if gzipped:
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+            daemon_threads = True
+
+        self.httpd = Server(('127.0.0.1', 0), Handler)
+        self.base_url = 'http://127.0.0.1:%d/v1/' % self.httpd.server_port
+
+    def __enter__(self):
+        thread = threading.Thread(target=self.httpd.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
 
 
 class TestApi:
@@ -105,25 +183,198 @@ class TestApi:
             self.api._unwrap_response(MockedResponse())
         assert excinfo.value.args[0] == '200: Test error message.'
 
-    @mock.patch('nobel.api.requests')
-    def test_get(self, mocked_requests):
+    def test_transport_default(self):
+        assert isinstance(self.api.transport, RequestsTransport)
+
+    def test_transport_custom(self):
+        transport = UrllibTransport()
+        assert nobel.Api(transport=transport).transport is transport
+        assert isinstance(nobel.Api(transport='urllib').transport,
+                          UrllibTransport)
+        assert isinstance(nobel.Api(transport=lambda url, params: None)
+                          .transport, CallableTransport)
+
+    def test_transport_invalid(self):
+        with pytest.raises(ValueError):
+            nobel.Api(transport='carrier-pigeon')
+        with pytest.raises(TypeError):
+            nobel.Api(transport=42)
+
+    def test_get(self):
         class MockedResponse(object):
             status_code = 200
 
             def json(self):
                 return {'response': 'test_get'}
 
-        mocked_requests.get = mock.MagicMock()
-        mocked_requests.get.return_value = MockedResponse()
-        resp = self.api._get('example.json', parameter_1='foo',
-                             parameter_2='bar')
-        mocked_requests.get.assert_called_once_with(
+        transport = mock.MagicMock(spec=Transport)
+        transport.get.return_value = MockedResponse()
+        api = nobel.Api(transport=transport)
+        resp = api._get('example.json', parameter_1='foo', parameter_2='bar')
+        transport.get.assert_called_once_with(
             'http://api.nobelprize.org/v1/example.json',
-            params={'parameter_1': 'foo', 'parameter_2': 'bar'}
+            {'parameter_1': 'foo', 'parameter_2': 'bar'}
         )
         assert resp == {'response': 'test_get'}
 
 
+class TestTransport:
+
+    def test_response_json(self):
+        assert Response(200, b'{"a": 1}').json() == {'a': 1}
+        assert Response(200, u'{"a": "\u00f1"}').json() == {'a': u'\xf1'}
+        assert Response(200, {'a': 1}).json() == {'a': 1}
+
+    @staticmethod
+    def mocked_response(body, encoding=None):
+        resp = mock.MagicMock()
+        resp.status_code = 200
+        resp.headers = {'Content-Encoding': encoding} if encoding else {}
+        resp.raw.read.side_effect = [body, b'']
+        return resp
+
+    def test_requests_transport(self):
+        mocked_requests = mock.MagicMock()
+        mocked_requests.get.return_value = self.mocked_response(b'{"a": 1}')
+        with mock.patch.dict('sys.modules', {'requests': mocked_requests}):
+            resp = RequestsTransport().get('http://example.com/', {'a': 1})
+        mocked_requests.get.assert_called_once_with(
+            'http://example.com/', params={'a': 1}, stream=True,
+            headers={'Accept-Encoding': mock.ANY})
+        assert resp.json() == {'a': 1}
+
+    def test_requests_transport_session(self):
+        session = mock.MagicMock()
+        session.get.return_value = self.mocked_response(
+            gzip_compress(b'{"a": 1}'), 'gzip')
+        resp = RequestsTransport(session).get('http://example.com/', {'a': 1})
+        session.get.assert_called_once_with(
+            'http://example.com/', params={'a': 1}, stream=True,
+            headers={'Accept-Encoding': mock.ANY})
+        assert resp.json() == {'a': 1}
+        assert resp.decoded_bytes == 8
+        assert resp.wire_bytes > 0
+        assert resp.encoding == 'gzip'
+
+    def test_requests_transport_no_compression(self):
+        session = mock.MagicMock()
+        session.get.return_value = self.mocked_response(b'{}')
+        RequestsTransport(session, compression=False).get('http://a/', {})
+        session.get.assert_called_once_with(
+            'http://a/', params={}, stream=True,
+            headers={'Accept-Encoding': 'identity'})
+
+    def test_read_body(self):
+        data = b'{"laureates": []}' * 100
+        deflate = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+        raw_deflate = deflate.compress(data) + deflate.flush()
+        for body, encoding in [(data, None), (data, 'identity'),
+                               (gzip_compress(data), 'gzip'),
+                               (zlib.compress(data), 'deflate'),
+                               (raw_deflate, 'deflate')]:
+            chunks = [body[i:i + 7] for i in range(0, len(body), 7)]
+            assert read_body(chunks, encoding) == (data, len(body))
+
+    def test_brotli(self):
+        # Google's brotli and brotlipy have different APIs
+        class Process(object):
+            def process(self, data):
+                return data.upper()
+
+        class Decompress(object):
+            def decompress(self, data):
+                return data.upper()
+
+        for decompressor in (Process, Decompress):
+            brotli = mock.Mock(spec=['Decompressor'])
+            brotli.Decompressor = decompressor
+            with mock.patch.dict('sys.modules', {'brotli': brotli}), \
+                    mock.patch('nobel.transport._accept_encoding', None):
+                assert accept_encoding() == 'gzip, deflate, br'
+                assert read_body([b'a', b'b'], 'br') == (b'AB', 2)
+        brotli = mock.Mock(spec=['Decompressor'])
+        brotli.Decompressor = object
+        with mock.patch.dict('sys.modules', {'brotli': brotli}), \
+                mock.patch('nobel.transport._accept_encoding', None):
+            assert accept_encoding() == 'gzip, deflate'
+
+    def test_callable_transport(self):
+        calls = []
+
+        def func(url, params):
+            calls.append((url, params))
+            return 200, '{"prizes": []}'
+
+        api = nobel.Api(transport=func)
+        assert api.prizes.all() == []
+        assert calls == [('http://api.nobelprize.org/v1/prize.json', {})]
+
+    def test_callable_transport_error(self):
+        api = nobel.Api(transport=lambda url, params: (400, {'error': 'Bad'}))
+        with pytest.raises(BadRequest):
+            api.prizes.all()
+
+    def test_urllib_transport(self):
+        responses = {
+            'prize.json': lambda params: (200, {'prizes': [
+                {'year': params['year'], 'category': u'peace'}]}),
+            'laureate.json': lambda params: (400, {'error': 'Bad request'}),
+        }
+        with LocalServer(responses) as server:
+            api = nobel.Api(base_url=server.base_url, transport='urllib')
+            prizes = api.prizes.filter(year=1901)
+            with pytest.raises(BadRequest):
+                api.laureates.filter(foo='bar')
+        assert server.requests[0] == ('prize.json', {'year': '1901'})
+        assert prizes[0].year == 1901
+        assert prizes[0].category == u'peace'
+
+    def test_urllib_transport_compression(self):
+        laureates = [{'id': str(i), 'firstname': u'Name'} for i in range(100)]
+        responses = {
+            'laureate.json': lambda params: (200, {'laureates': laureates}),
+        }
+        with LocalServer(responses, compress=True) as server:
+            api = nobel.Api(base_url=server.base_url, transport='urllib')
+            assert len(api.laureates.all()) == 100
+        assert 'gzip' in server.accept_encodings[0]
+        transfer, = api.transfers
+        assert transfer.url == server.base_url + 'laureate.json'
+        assert transfer.status_code == 200
+        assert transfer.encoding == 'gzip'
+        assert transfer.decoded_bytes == len(json.dumps(
+            {'laureates': laureates}))
+        assert transfer.wire_bytes < transfer.decoded_bytes
+        assert api.wire_bytes == transfer.wire_bytes
+        assert api.decoded_bytes == transfer.decoded_bytes
+
+    def test_urllib_transport_no_compression(self):
+        responses = {'prize.json': lambda params: (200, {'prizes': []})}
+        with LocalServer(responses, compress=True) as server:
+            api = nobel.Api(base_url=server.base_url,
+                            transport=UrllibTransport(compression=False))
+            api.prizes.all()
+        assert server.accept_encodings == ['identity']
+        assert api.transfers[0].encoding is None
+        assert api.wire_bytes == api.decoded_bytes == len(b'{"prizes": []}')
+
+    def test_transfers_callable_transport(self):
+        # Transports not reporting sizes are not accounted
+        api = nobel.Api(transport=lambda url, params: (200, {'prizes': []}))
+        api.prizes.all()
+        assert api.wire_bytes == api.decoded_bytes == 0
+        assert len(api.transfers) == 0
+
+    def test_lazy_import(self):
+        # Importing nobel must not pull in any HTTP library
+        root = os.path.dirname(os.path.dirname(os.path.abspath(
+            nobel.__file__)))
+        code = ('import sys, nobel; nobel.Api(); '
+                'sys.exit(int("requests" in sys.modules or '
+                '"urllib2" in sys.modules or "http.client" in sys.modules))')
+        assert subprocess.call([sys.executable, '-c', code], cwd=root) == 0
+
+
 class TestData:
 
     def setup_method(self, method):
@@ -189,7 +440,46 @@ class TestData:
     @mock.patch('nobel.data.NobelObject.filter')
     def test_all(self, mocked_filter):
         self.MyObject.all()
-        mocked_filter.assert_called_once_with()
+        mocked_filter.assert_called_once_with(only=None, defer=None)
+
+    def test_fields(self):
+        assert self.MyObject._fields() is None
+        # projections including every attribute are no projections
+        assert self.MyObject._fields(only=('attr_c',)) is None
+        assert self.MyObject._fields(defer=('attr_c',)) == \
+            frozenset(['attr_a', 'attr_b'])
+        assert self.MyObject._fields(only=('attr_a',)) == \
+            frozenset(['attr_a', 'attr_b'])
+        # unique fields can't be deferred
+        assert self.MyObject._fields(defer=('attr_a',)) is None
+        with pytest.raises(ValueError):
+            self.MyObject._fields(only=('attr_d',))
+
+    @mock.patch('nobel.Api._get')
+    def test_filter_projection(self, mocked_get):
+        mocked_get.return_value = {'objects': [{'attrA': 'foo', 'attrB': 1,
+                                                'attrC': 'bar'}]}
+        obj, = self.MyObject.filter(only=('attr_a',), attr_b=1)
+        mocked_get.assert_called_once_with('object.json', attrB=1)
+        assert obj.full is False
+        assert 'attr_c' not in obj.__dict__
+        # deferred attributes are loaded on access
+        assert obj.attr_c == 'bar'
+        assert obj.full is True
+        obj, = self.MyObject.all(defer=('attr_c',))
+        assert obj.attr_a == 'foo'
+        assert 'attr_c' not in obj.__dict__
+        obj, = self.MyObject.all(defer=())
+        assert obj.full is True
+
+    @mock.patch('nobel.Api._get')
+    def test_get_projection(self, mocked_get):
+        mocked_get.return_value = {'objects': [{'attrA': 'foo', 'attrB': 1,
+                                                'attrC': 'bar'}]}
+        obj = self.MyObject.get(defer=('attr_c',), attr_a='foo')
+        mocked_get.assert_called_once_with('object.json', attrA='foo')
+        assert obj.full is False
+        assert 'attr_c' not in obj.__dict__
 
     @mock.patch('nobel.Api._get')
     def test_get(self, mocked_get):
@@ -273,6 +563,23 @@ class TestLaureate:
     def setup_method(self, method):
         self.api = nobel.Api()
 
+    def test_projection_without_surname(self):
+        calls = []
+
+        def transport(url, params):
+            calls.append(params)
+            return 200, {u'laureates': [
+                {u'id': u'482', u'firstname': u'Red Cross'},
+                {u'id': u'26', u'firstname': u'Albert',
+                 u'surname': u'Einstein', u'gender': u'male'}]}
+
+        api = nobel.Api(transport=transport)
+        red_cross, einstein = api.laureates.all(only=('firstname',
+                                                      'surname'))
+        assert unicode(red_cross) == u'Red Cross'
+        assert unicode(einstein) == u'Albert Einstein'
+        assert calls == [{}]
+
     @mock.patch('nobel.api.Api.countries')
     @mock.patch('nobel.prizes.Prize._parse')
     def test_parse(self, mocked_parse, mocked_countries):
@@ -299,6 +606,20 @@ class TestLaureate:
         assert obj.died_country.name == u'Italy'
         assert obj.died_country.code == u'IT'
 
+    @mock.patch('nobel.api.Api.countries')
+    @mock.patch('nobel.prizes.Prize._parse')
+    def test_parse_projection(self, mocked_parse, mocked_countries):
+        data = {u'id': u'4', u'firstname': u'Alfred', u'surname': u'Nobel',
+                u'bornCountry': u'Sweden', u'bornCountryCode': 'SE',
+                u'born': u'1833-10-21', u'prizes': ['prize_1', 'prize_2']}
+        fields = self.api.laureates._fields(only=('firstname', 'surname'))
+        obj = self.api.laureates._parse(data, fields=fields)
+        assert sorted(k for k in obj.__dict__ if not k.startswith('_')) == \
+            ['firstname', 'full', 'id', 'surname']
+        assert obj.id == 4
+        assert not mocked_parse.called
+        assert not mocked_countries.called
+
     def test_unicode(self):
         data = {u'id': u'4', u'firstname': u'Toño', u'surname': u'Ñandú'}
         obj = self.api.laureates._parse(data)
@@ -351,6 +672,20 @@ class TestPrize:
         obj = self.api.prizes._parse(data)
         assert obj.motivation == u'because'
 
+    @mock.patch('nobel.laureates.Laureate._parse')
+    def test_parse_projection(self, mocked_parse):
+        data = {u'category': u'physics', u'year': u'2006',
+                u'laureates': [{u'id': 1, u'motivation': u'because'}]}
+        fields = self.api.prizes._fields(defer=('laureates',))
+        obj = self.api.prizes._parse(data, fields=fields)
+        assert not mocked_parse.called
+        assert 'laureates' not in obj.__dict__
+        assert obj.motivation == u'because'
+        fields = self.api.prizes._fields(only=('year',))
+        obj = self.api.prizes._parse(data, fields=fields)
+        assert sorted(k for k in obj.__dict__ if not k.startswith('_')) == \
+            ['category', 'full', 'year']
+
     def test_unicode(self):
         data = {u'category': u'physics', u'year': u'2006'}
         obj = self.api.prizes._parse(data)
@@ -372,3 +707,590 @@ class TestCountry:
             assert obj.__unicode__() == u'Spain'
         else:
             assert obj.__str__() == 'Spain'
+
+
+class TestSearchIndex:
+
+    def setup_method(self, method):
+        self.api = nobel.Api(index=True)
+        self.prizes = {'prizes': [
+            {u'year': u'1921', u'category': u'physics', u'laureates': [
+                {u'id': u'26', u'firstname': u'Albert',
+                 u'surname': u'Einstein',
+                 u'motivation': u'"for his services to Theoretical '
+                                u'Physics"'}]},
+            {u'year': u'1911', u'category': u'chemistry', u'laureates': [
+                {u'id': u'6', u'firstname': u'Marie',
+                 u'surname': u'Curie, née Sklodowska',
+                 u'motivation': u'"in recognition of her services to '
+                                u'chemistry"'}]},
+            {u'year': u'1903', u'category': u'physics', u'laureates': [
+                {u'id': u'5', u'firstname': u'Pierre', u'surname': u'Curie'},
+                {u'id': u'6', u'firstname': u'Marie',
+                 u'surname': u'Curie, née Sklodowska'}]},
+        ]}
+
+    def test_tokenize(self):
+        assert tokenize(u'Curie, née Skłodowska') == \
+            [u'curie', u'nee', u'skłodowska']
+        assert tokenize(u'Frédéric PASSY') == [u'frederic', u'passy']
+        assert tokenize(None) == []
+
+    def test_disabled(self):
+        with pytest.raises(NobelError):
+            nobel.Api().search('einstein')
+
+    @mock.patch('nobel.Api._get')
+    def test_lazy_load_identity(self, mocked_get):
+        mocked_get.return_value = self.prizes
+        einstein = self.api.prizes.all()[0].laureates[0]
+        assert self.api.search('einstein') == [einstein]
+        mocked_get.return_value = {'laureates': [
+            {u'id': u'26', u'firstname': u'Albert', u'surname': u'Einstein',
+             u'born': u'1879-03-14',
+             u'prizes': [{u'year': u'1921', u'category': u'physics'}]}]}
+        assert einstein.born == datetime.date(1879, 3, 14)
+        result, = self.api.search('einstein')
+        assert result is einstein
+        assert result.full is True
+
+    @mock.patch('nobel.Api._get')
+    def test_incremental(self, mocked_get):
+        assert len(self.api.index) == 0
+        mocked_get.return_value = self.prizes
+        self.api.prizes.all()
+        # 3 prizes and 3 distinct laureates
+        assert len(self.api.index) == 6
+        mocked_get.return_value = {'laureates': [
+            {u'id': u'6', u'firstname': u'Marie', u'surname': u'Curie'}]}
+        marie = self.api.laureates.get(id=6)
+        assert len(self.api.index) == 6
+        # full objects replace partial ones and their tokens
+        assert self.api.search('marie') == [marie]
+        assert self.api.search('sklodowska') == []
+
+    @mock.patch('nobel.Api._get')
+    def test_search(self, mocked_get):
+        mocked_get.return_value = self.prizes
+        self.api.prizes.all()
+        search = self.api.search
+        assert [obj.id for obj in search('einstein')] == [26]
+        assert [obj.id for obj in search('EINSTEIN albert')] == [26]
+        assert [obj.id for obj in search('einst')] == [26]
+        assert [obj.id for obj in search('einstien')] == [26]
+        assert [obj.id for obj in search('pierre curie')] == [5, 6]
+        assert [obj.id for obj in search('curie', limit=1)] == [5]
+        assert search('sklodowska') == search(u'Skłodowska')
+        assert [(p.category, p.year) for p in
+                search('services', resource='prize')] == \
+            [('chemistry', 1911), ('physics', 1921)]
+        assert search('zzz') == []
+        assert search('') == []
+
+
+class TestProxy:
+
+    def setup_method(self, method):
+        self.calls = []
+
+        def upstream(url, params):
+            self.calls.append((url, params))
+            if url.endswith('laureate.json') and params.get('id') == '0':
+                return 400, {'error': 'Bad id'}
+            return 200, {'laureates': [{'id': params.get('id', '1')}]}
+
+        self.cache = ProxyCache('http://upstream/v1/', upstream)
+
+    def test_read_through(self):
+        assert self.cache.get('laureate.json', {'id': '26'}) == \
+            (200, b'{"laureates": [{"id": "26"}]}')
+        assert self.cache.get('laureate.json', {'id': '26'}) == \
+            (200, b'{"laureates": [{"id": "26"}]}')
+        assert self.calls == [('http://upstream/v1/laureate.json',
+                               {'id': '26'})]
+        stats = self.cache.stats()
+        assert stats['requests'] == 2
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['entries'] == 1
+        assert stats['hit_rate'] == 0.5
+
+    def test_errors_not_cached(self):
+        assert self.cache.get('laureate.json', {'id': '0'})[0] == 400
+        assert self.cache.get('laureate.json', {'id': '0'})[0] == 400
+        assert len(self.calls) == 2
+
+    def test_upstream_failure(self):
+        def upstream(url, params):
+            raise IOError('Connection refused')
+
+        cache = ProxyCache('http://upstream/v1/', upstream)
+        code, body = cache.get('prize.json', {})
+        assert code == 502
+        assert 'Connection refused' in body
+        assert cache.stats()['upstream_errors'] == 1
+
+    def test_ttl(self):
+        self.cache.ttl = 0
+        self.cache.get('laureate.json', {'id': '26'})
+        self.cache.get('laureate.json', {'id': '26'})
+        assert len(self.calls) == 2
+
+    def test_expired_evicted(self):
+        self.cache.ttl = 0.05
+        for i in range(1, 6):
+            self.cache.get('laureate.json', {'id': unicode(i)})
+        time.sleep(0.1)
+        self.cache.get('laureate.json', {'id': '26'})
+        stats = self.cache.stats()
+        assert stats['entries'] == 1
+        assert stats['evictions'] == 5
+
+    def test_max_entries(self):
+        self.cache.max_entries = 3
+        for i in range(1, 6):
+            self.cache.get('laureate.json', {'id': unicode(i)})
+        stats = self.cache.stats()
+        assert stats['entries'] == 3
+        assert stats['evictions'] == 2
+        # the oldest were evicted
+        self.cache.get('laureate.json', {'id': '5'})
+        assert len(self.calls) == 5
+        self.cache.get('laureate.json', {'id': '1'})
+        assert len(self.calls) == 6
+
+    def test_collapse(self):
+        release = threading.Event()
+
+        def upstream(url, params):
+            self.calls.append((url, params))
+            release.wait()
+            return 200, {'prizes': []}
+
+        cache = ProxyCache('http://upstream/v1/', upstream)
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(cache.get('prize.json', {})))
+            for i in range(10)]
+        for thread in threads:
+            thread.start()
+        while cache.stats()['requests'] < 10:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert len(self.calls) == 1
+        assert results == [(200, b'{"prizes": []}')] * 10
+        assert cache.stats()['collapsed'] == 9
+
+    def test_server(self):
+        server = make_server(port=0, cache=self.cache)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            base_url = 'http://127.0.0.1:%d/v1/' % server.server_port
+            api = nobel.Api(base_url=base_url, transport='urllib')
+            assert api.laureates.get(id=26).id == 26
+            assert api.laureates.get(id=26).id == 26
+            with pytest.raises(BadRequest):
+                api.laureates.get(id=0)
+            with pytest.raises(NobelError):
+                api._get('foo.json')
+            stats = api._get('stats.json')
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert len(self.calls) == 2
+        assert stats['hits'] == 1
+        assert stats['requests'] == 3
+
+
+class TestAwardTable:
+
+    def setup_method(self, method):
+        self.api = nobel.Api()
+        parse = self.api.laureates._parse
+        self.laureates = [parse(data, full=True) for data in
+                          [{u'id': u'1', u'firstname': u'Wilhelm',
+                            u'gender': u'male', u'born': u'1845-03-27',
+                            u'bornCountry': u'Germany',
+                            u'bornCountryCode': u'DE',
+                            u'prizes': [{u'year': u'1901',
+                                         u'category': u'physics'}]},
+                           {u'id': u'6', u'firstname': u'Marie',
+                            u'gender': u'female', u'born': u'1867-11-07',
+                            u'bornCountry': u'Poland',
+                            u'bornCountryCode': u'PL',
+                            u'prizes': [{u'year': u'1903',
+                                         u'category': u'physics'},
+                                        {u'year': u'1911',
+                                         u'category': u'chemistry'}]}]]
+        self.prize = self.api.prizes._parse(
+            {u'year': u'1921', u'category': u'physics', u'laureates': [
+                {u'id': u'26', u'firstname': u'Albert'}]}, full=True)
+
+    def test_columns(self):
+        awards = AwardTable(self.laureates)
+        assert len(awards) == 3
+        assert awards.data['laureate_id'] == [1, 6, 6]
+        assert awards.data['born_country_code'] == [u'DE', u'PL', u'PL']
+        assert awards.data['decade'] == [1900, 1900, 1910]
+        assert awards.data['age'] == [56, 36, 44]
+
+    def test_group_by(self):
+        awards = AwardTable(self.laureates)
+        assert awards.group_by().count() == {(): 3}
+        assert awards.group_by('decade').count() == {1900: 2, 1910: 1}
+        assert awards.group_by('category', 'gender').count() == \
+            {(u'physics', u'male'): 1, (u'physics', u'female'): 1,
+             (u'chemistry', u'female'): 1}
+        assert awards.group_by('category').min('age') == \
+            {u'physics': 36, u'chemistry': 44}
+        assert awards.group_by('category').max('age') == \
+            {u'physics': 56, u'chemistry': 44}
+        assert awards.group_by('category').mean('age') == \
+            {u'physics': 46.0, u'chemistry': 44.0}
+        with pytest.raises(ValueError):
+            awards.group_by('foo')
+        with pytest.raises(ValueError):
+            awards.group_by('category').mean('foo')
+
+    def test_incremental(self):
+        awards = AwardTable(self.laureates)
+        count = awards.group_by('category')
+        assert count.count() == {u'physics': 2, u'chemistry': 1}
+        assert count.mean('age') == {u'physics': 46.0, u'chemistry': 44.0}
+        awards.merge([self.prize])
+        assert len(awards) == 4
+        assert awards._aggregates  # updated, not recomputed
+        assert count.count() == {u'physics': 3, u'chemistry': 1}
+        # the new laureate has no birth date, so no age
+        assert count.mean('age') == {u'physics': 46.0, u'chemistry': 44.0}
+
+    def test_merge_fills_missing(self):
+        awards = AwardTable([self.prize])
+        assert awards.group_by('gender').count() == {None: 1}
+        einstein = self.api.laureates._parse(
+            {u'id': u'26', u'gender': u'male', u'born': u'1879-03-14',
+             u'prizes': [{u'year': u'1921', u'category': u'physics'}]})
+        awards.merge([einstein])
+        assert len(awards) == 1
+        assert awards.data['firstname'] == [u'Albert']
+        assert awards.data['age'] == [42]
+        assert awards.group_by('gender').count() == {u'male': 1}
+
+
+class TestSerialize:
+
+    def setup_method(self, method):
+        self.api = nobel.Api()
+        self.prizes = [self.api.prizes._parse(data, full=True) for data in [
+            {u'year': u'1903', u'category': u'physics', u'laureates': [
+                {u'id': u'5', u'firstname': u'Pierre', u'surname': u'Curie',
+                 u'motivation': u'"in recognition of the extraordinary '
+                                u'services they have rendered"'},
+                {u'id': u'6', u'firstname': u'Marie',
+                 u'surname': u'Curie, née Sklodowska'}]},
+            {u'year': u'1911', u'category': u'chemistry'}]]
+        marie = self.api.laureates._parse({
+            u'id': u'6', u'firstname': u'Marie', u'born': u'1867-11-07',
+            u'bornCountry': u'Russian Empire (now Poland)',
+            u'bornCountryCode': u'PL'}, full=True)
+        marie.prizes = self.prizes
+        self.marie = marie
+
+    def check(self, marie, api):
+        assert isinstance(marie, api.laureates)
+        assert marie.api is api
+        assert marie.full is True
+        assert marie.id == 6
+        assert marie.born == datetime.date(1867, 11, 7)
+        assert marie.born_country.code == u'PL'
+        assert isinstance(marie.born_country, api.countries)
+        physics, chemistry = marie.prizes
+        assert isinstance(physics, api.prizes)
+        assert physics.full is True
+        assert physics.motivation.startswith(u'"in recognition')
+        assert physics.laureates[1].surname == u'Curie, née Sklodowska'
+        assert physics.laureates[1].full is False
+        assert chemistry.year == 1911
+
+    def test_roundtrip(self):
+        api = nobel.Api()
+        data = serialize.dumps([self.marie, self.prizes])
+        assert isinstance(data, bytes)
+        marie, prizes = serialize.loads(data, api)
+        self.check(marie, api)
+        # shared references are kept
+        assert marie.prizes[0] is prizes[0]
+
+    def test_projection(self):
+        fields = self.api.laureates._fields(only=('firstname', 'surname'))
+        red_cross = self.api.laureates._parse(
+            {u'id': u'482', u'firstname': u'Red Cross'}, fields=fields)
+        red_cross, = serialize.loads(serialize.dumps([red_cross]), self.api)
+        assert red_cross.full is False
+        assert red_cross._parsed == fields
+        with mock.patch('nobel.Api._get') as mocked_get:
+            assert not hasattr(red_cross, 'surname')
+            assert not mocked_get.called
+
+    def test_values(self):
+        values = [None, True, False, 0, 1, -1, 300, -2 ** 40, 1.5, u'',
+                  u'ñ', u'ñ', datetime.date(1901, 12, 10), [[]]]
+        assert serialize.loads(serialize.dumps(values), self.api) == values
+        with pytest.raises(serialize.SerializationError):
+            serialize.dumps(object())
+
+    def test_invalid(self):
+        with pytest.raises(serialize.SerializationError):
+            serialize.loads(b'foo', self.api)
+        data = serialize.dumps([self.marie])
+        with pytest.raises(serialize.SerializationError):
+            serialize.loads(data[:-3], self.api)
+        # truncated at any point, including inside strings and floats
+        for value in ([u'hello world'], [1.5], [self.marie]):
+            data = serialize.dumps(value)
+            for size in range(len(data)):
+                with pytest.raises(serialize.SerializationError):
+                    serialize.loads(data[:size], self.api)
+            with pytest.raises(serialize.SerializationError):
+                serialize.loads(data + b'\x00', self.api)
+
+    def test_smaller_than_json(self):
+        data = {u'laureates': [{u'id': unicode(i), u'firstname': u'Marie',
+                                u'surname': u'Curie', u'born': u'1867-11-07',
+                                u'prizes': [{u'year': u'1903',
+                                             u'category': u'physics'}]}
+                               for i in range(100)]}
+        laureates = [self.api.laureates._parse(d, full=True)
+                     for d in data[u'laureates']]
+        assert len(serialize.dumps(laureates)) < len(json.dumps(data)) / 2
+
+    def test_pickle(self):
+        import pickle
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            marie, prizes = pickle.loads(
+                pickle.dumps([self.marie, self.prizes], protocol))
+            self.check(marie, marie.api)
+            assert marie.api is not self.api
+            assert marie.api.base_url == self.api.base_url
+            assert marie.prizes[0] is prizes[0]
+            assert marie.api.laureates is marie.api.laureates
+
+    def test_pickle_size(self):
+        # Neither the search index nor the transfer log are pickled
+        import pickle
+        api = nobel.Api(index=True)
+        laureates = [api.laureates._parse(
+            {u'id': unicode(i), u'firstname': u'Firstname%d' % i,
+             u'surname': u'Surname%d' % i,
+             u'prizes': [{u'year': u'1903', u'category': u'physics',
+                          u'motivation': u'"for his discoveries"'}]},
+            full=True) for i in range(1000)]
+        api.transfers.extend([('http://example.com/', 200, 1, 1, None)] * 100)
+        data = pickle.dumps(laureates[0], pickle.HIGHEST_PROTOCOL)
+        assert len(data) < 1000
+        laureate = pickle.loads(data)
+        assert laureate.surname == u'Surname0'
+        assert laureate.api.index is not None
+        assert len(laureate.api.transfers) == 0
+
+
+class TestThreads:
+
+    def run_threads(self, target, count=50):
+        start = threading.Event()
+        results = []
+        errors = []
+
+        def run():
+            start.wait()
+            try:
+                results.append(target())
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        return results
+
+    def test_resource_classes(self):
+        for i in range(10):
+            api = nobel.Api()
+            classes = self.run_threads(lambda: (api.prizes, api.laureates,
+                                                api.countries))
+            assert len(set(classes)) == 1
+
+    def test_hydration(self):
+        def laureate(params):
+            time.sleep(0.05)
+            return 200, {'laureates': [{'id': params['id'],
+                                        'firstname': 'Albert',
+                                        'surname': 'Einstein',
+                                        'prizes': [{'year': '1921',
+                                                    'category': 'physics'}]}]}
+
+        with LocalServer({'laureate.json': laureate}) as server:
+            api = nobel.Api(base_url=server.base_url, transport='urllib',
+                            index=True)
+            laureates = []
+            for i in range(5):
+                obj = api.laureates()
+                obj.id = i
+                laureates.append(obj)
+            results = self.run_threads(
+                lambda: [(obj.surname, len(obj.prizes))
+                         for obj in laureates])
+        # exactly one request per object
+        assert sorted(server.requests, key=lambda r: r[1]['id']) == \
+            [('laureate.json', {'id': str(i)}) for i in range(5)]
+        assert results == [[(u'Einstein', 1)] * 5] * 50
+        assert all(obj.full for obj in laureates)
+
+
+class TestBatch:
+
+    def setup_method(self, method):
+        self.calls = []
+        self.lock = threading.Lock()
+
+        def upstream(url, params):
+            with self.lock:
+                self.calls.append((url.rsplit('/', 1)[-1], params))
+            time.sleep(0.1)
+            if url.endswith('prize.json'):
+                return 200, {'prizes': [
+                    {'year': '1921', 'category': category}
+                    for category in ('physics', 'chemistry', 'peace')
+                    if params.get('category', category) == category]}
+            if params.get('id') == 0:
+                return 400, {'error': 'Bad id'}
+            return 200, {'laureates': [{'id': params.get('id', 1),
+                                        'firstname': 'Albert'}]}
+
+        self.api = nobel.Api(transport=upstream)
+
+    def test_concurrent(self):
+        start = time.time()
+        with self.api.batch():
+            prize = self.api.prizes.get(year=1921, category='peace')
+            laureate = self.api.laureates.get(id=26)
+            laureates = self.api.laureates.all(only=('firstname',))
+            assert isinstance(prize, Deferred)
+            assert not prize.done
+            assert self.calls == []
+        assert time.time() - start < 0.25
+        assert len(self.calls) == 3
+        assert prize.done
+        assert prize.result().category == 'peace'
+        assert laureate.result().id == 26
+        assert laureates.result()[0].full is False
+
+    def test_result_dispatches(self):
+        with self.api.batch():
+            first = self.api.laureates.get(id=26)
+            second = self.api.laureates.get(id=5)
+            assert first.result().id == 26
+            assert second.done
+            third = self.api.laureates.get(id=6)
+            assert not third.done
+        assert third.result().id == 6
+        assert len(self.calls) == 3
+        # outside of the batch queries are sent right away
+        assert self.api.laureates.get(id=7).id == 7
+
+    def test_dedup(self):
+        with self.api.batch():
+            results = [self.api.laureates.get(id=26) for i in range(5)]
+            results.append(self.api.laureates.filter(id=26))
+        assert self.calls == [('laureate.json', {'id': 26})]
+        assert [obj.result().id for obj in results[:5]] == [26] * 5
+        assert results[5].result()[0].id == 26
+
+    def test_dedup_normalized(self):
+        with self.api.batch():
+            first = self.api.prizes.filter(year=1921)
+            second = self.api.prizes.filter(year='1921')
+        assert self.calls == [('prize.json', {'year': 1921})]
+        assert repr(first.result()) == repr(second.result())
+
+    def test_merge(self):
+        with self.api.batch():
+            physics = self.api.prizes.get(year=1921, category='physics')
+            peace = self.api.prizes.get(year=1921, category='peace')
+            everything = self.api.prizes.filter(year=1921)
+        assert self.calls == [('prize.json', {'year': 1921})]
+        assert physics.result().category == 'physics'
+        assert peace.result().category == 'peace'
+        assert len(everything.result()) == 3
+
+    def test_non_ascii_bytes(self):
+        with self.api.batch():
+            first = self.api.laureates.filter(born_country=b'C\xc3\xb4te')
+            second = self.api.laureates.filter(born_country=u'C\xf4te')
+        assert self.calls == [('laureate.json',
+                               {'bornCountry': b'C\xc3\xb4te'})]
+        assert first.result()[0].id == 1
+        assert second.result()[0].id == 1
+
+    def test_failed_dispatch(self):
+        with mock.patch.object(Batch, '_plan', side_effect=ValueError('x')):
+            with self.api.batch():
+                first = self.api.laureates.get(id=26)
+                second = self.api.laureates.get(id=5)
+        for deferred in (first, second):
+            assert deferred.done
+            with pytest.raises(ValueError):
+                deferred.result()
+
+    def test_merge_case_insensitive(self):
+        with self.api.batch():
+            physics = self.api.prizes.get(year=1921, category='Physics')
+            peace = self.api.prizes.get(year=1921, category='peace')
+        assert len(self.calls) == 1
+        assert physics.result().category == 'physics'
+        assert peace.result().category == 'peace'
+
+    def test_no_merge_without_narrowing(self):
+        # Merging these would fetch every prize
+        with self.api.batch():
+            physics = self.api.prizes.filter(category='physics')
+            peace = self.api.prizes.filter(category='peace')
+        assert sorted(params['category'] for url, params in self.calls) == [
+            'peace', 'physics']
+        assert [p.category for p in physics.result()] == ['physics']
+        assert [p.category for p in peace.result()] == ['peace']
+
+    def test_errors(self):
+        with self.api.batch():
+            bad = self.api.laureates.get(id=0)
+            missing = self.api.prizes.get(year=1921, category='economics')
+            good = self.api.laureates.get(id=26)
+        with pytest.raises(BadRequest):
+            bad.result()
+        with pytest.raises(NotFoundError):
+            missing.result()
+        assert good.result().id == 26
+
+    def test_hydration_not_batched(self):
+        laureate = self.api.laureates()
+        laureate.id = 26
+        with self.api.batch():
+            assert laureate.firstname == 'Albert'
+
+    def test_threads(self):
+        results = []
+        with self.api.batch():
+            thread = threading.Thread(
+                target=lambda: results.append(self.api.laureates.get(id=5)))
+            thread.start()
+            thread.join()
+        # batches only apply to the thread which created them
+        assert results[0].id == 5
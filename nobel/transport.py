@@ -0,0 +1,284 @@
+"""HTTP transports.
+
+A transport performs the actual HTTP requests against the Nobel API on behalf
+of an `Api` instance. Transports only need to implement `get(url, params)`,
+returning an object with a `status_code` attribute and a `json()` method.
+
+HTTP libraries are imported the first time a request is made, not when this
+module is imported, so that `import nobel` stays cheap.
+
+The bundled transports negotiate compressed responses (gzip and deflate, and
+brotli if the `brotli` or `brotlipy` package is installed), decompress them
+as they are read, and report the size of the body on the wire (`wire_bytes`)
+along with its decoded size (`decoded_bytes`) in their responses.
+
+"""
+
+import json
+import zlib
+
+
+__all__ = ['Response', 'Transport', 'RequestsTransport', 'UrllibTransport',
+           'CallableTransport', 'get_transport']
+
+
+CHUNK_SIZE = 16 * 1024
+
+_accept_encoding = None
+
+
+def _brotli_decompressor():
+    """Return the decompressor class of the installed `brotli` module, or
+    `None` if there is none with a known API.
+
+    Both Google's `brotli` (`Decompressor.process`) and `brotlipy`
+    (`Decompressor.decompress`) are installed as `brotli`.
+
+    """
+
+    try:
+        import brotli
+    except ImportError:
+        return None
+    decompressor = getattr(brotli, 'Decompressor', None)
+    if hasattr(decompressor, 'process') or \
+            hasattr(decompressor, 'decompress'):
+        return decompressor
+    return None
+
+
+def accept_encoding():
+    """Return the value of the Accept-Encoding header to send."""
+
+    global _accept_encoding
+    if _accept_encoding is None:
+        if _brotli_decompressor() is not None:
+            _accept_encoding = 'gzip, deflate, br'
+        else:
+            _accept_encoding = 'gzip, deflate'
+    return _accept_encoding
+
+
+class _IdentityDecoder(object):
+
+    def decompress(self, data):
+        return data
+
+    def flush(self):
+        return b''
+
+
+class _ZlibDecoder(object):
+    """Decoder for gzip and deflate content encodings.
+
+    Servers sending "deflate" may use raw deflate streams, without the zlib
+    header, so this falls back to them if the first chunk can't be decoded.
+
+    """
+
+    def __init__(self):
+        self._obj = zlib.decompressobj(32 + zlib.MAX_WBITS)
+        self._first = True
+
+    def decompress(self, data):
+        if self._first and data:
+            self._first = False
+            try:
+                return self._obj.decompress(data)
+            except zlib.error:
+                self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self._obj.decompress(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+
+class _BrotliDecoder(object):
+
+    def __init__(self):
+        obj = _brotli_decompressor()()
+        self._process = getattr(obj, 'process', None) or obj.decompress
+
+    def decompress(self, data):
+        return self._process(data)
+
+    def flush(self):
+        return b''
+
+
+def read_body(chunks, encoding=None):
+    """Read and decode a response body.
+
+    `chunks` is an iterable of the raw body chunks and `encoding` the value
+    of the Content-Encoding header. Each chunk is decompressed as soon as it
+    is read. Returns the decoded body and its size on the wire.
+
+    """
+
+    encoding = (encoding or 'identity').strip().lower()
+    if encoding in ('gzip', 'x-gzip', 'deflate'):
+        decoder = _ZlibDecoder()
+    elif encoding == 'br':
+        decoder = _BrotliDecoder()
+    else:
+        decoder = _IdentityDecoder()
+    parts = []
+    wire_bytes = 0
+    for chunk in chunks:
+        wire_bytes += len(chunk)
+        parts.append(decoder.decompress(chunk))
+    parts.append(decoder.flush())
+    return b''.join(parts), wire_bytes
+
+
+class Response(object):
+    """Minimal HTTP response, as returned by the bundled transports."""
+
+    def __init__(self, status_code, content, wire_bytes=None, encoding=None):
+        self.status_code = status_code
+        self.content = content
+        self.wire_bytes = wire_bytes
+        self.encoding = encoding
+
+    @property
+    def decoded_bytes(self):
+        if isinstance(self.content, bytes):
+            return len(self.content)
+        return None
+
+    def json(self):
+        content = self.content
+        if isinstance(content, (dict, list)):
+            return content
+        if not isinstance(content, unicode):
+            content = content.decode('utf-8')
+        return json.loads(content)
+
+
+class Transport(object):
+    """Transport interface."""
+
+    def get(self, url, params):
+        """Perform a GET request on `url` with `params` as query string."""
+
+        raise NotImplementedError
+
+
+class RequestsTransport(Transport):
+    """Transport based on the `requests` library.
+
+    An optional `requests.Session` can be given to reuse connections. Set
+    `compression` to `False` to ask for uncompressed responses.
+
+    """
+
+    def __init__(self, session=None, compression=True):
+        self.session = session
+        self.compression = compression
+
+    def get(self, url, params):
+        if self.session is not None:
+            getter = self.session.get
+        else:
+            import requests
+            getter = requests.get
+        encoding = accept_encoding() if self.compression else 'identity'
+        resp = getter(url, params=params, stream=True,
+                      headers={'Accept-Encoding': encoding})
+        try:
+            # Read the raw body to decode it (and count it) ourselves
+            raw = resp.raw
+            encoding = resp.headers.get('Content-Encoding')
+            content, wire_bytes = read_body(
+                iter(lambda: raw.read(CHUNK_SIZE, decode_content=False), b''),
+                encoding)
+        finally:
+            resp.close()
+        return Response(resp.status_code, content, wire_bytes, encoding)
+
+
+class UrllibTransport(Transport):
+    """Transport based on the standard library, with no dependencies.
+
+    Set `compression` to `False` to ask for uncompressed responses.
+
+    """
+
+    def __init__(self, timeout=None, compression=True):
+        self.timeout = timeout
+        self.compression = compression
+
+    def get(self, url, params):
+        import urllib
+        import urllib2
+
+        if params:
+            query = [(k, v.encode('utf-8') if isinstance(v, unicode) else v)
+                     for k, v in sorted(params.items())]
+            url = '%s?%s' % (url, urllib.urlencode(query))
+        encoding = accept_encoding() if self.compression else 'identity'
+        request = urllib2.Request(url, headers={'Accept-Encoding': encoding})
+        try:
+            if self.timeout is None:
+                resp = urllib2.urlopen(request)
+            else:
+                resp = urllib2.urlopen(request, timeout=self.timeout)
+        except urllib2.HTTPError as e:
+            # Error responses still carry a JSON body with the error message
+            resp = e
+        try:
+            encoding = resp.info().get('Content-Encoding')
+            content, wire_bytes = read_body(
+                iter(lambda: resp.read(CHUNK_SIZE), b''), encoding)
+            return Response(resp.code, content, wire_bytes, encoding)
+        finally:
+            resp.close()
+
+
+class CallableTransport(Transport):
+    """Transport delegating to a user supplied callable.
+
+    The callable is called as `func(url, params)` and must return either a
+    response-like object (with `status_code` and `json()`) or a
+    `(status_code, content)` tuple, where `content` can be the raw JSON
+    body or the already decoded data.
+
+    """
+
+    def __init__(self, func):
+        self.func = func
+
+    def get(self, url, params):
+        resp = self.func(url, params)
+        if isinstance(resp, tuple):
+            resp = Response(*resp)
+        return resp
+
+
+TRANSPORTS = {
+    'requests': RequestsTransport,
+    'urllib': UrllibTransport,
+}
+
+
+def get_transport(transport=None):
+    """Return a transport instance.
+
+    `transport` can be a `Transport` instance, one of the names in
+    `TRANSPORTS` or a callable (see `CallableTransport`). Defaults to
+    `RequestsTransport`.
+
+    """
+
+    if transport is None:
+        return RequestsTransport()
+    if isinstance(transport, Transport):
+        return transport
+    if isinstance(transport, basestring):
+        try:
+            return TRANSPORTS[transport]()
+        except KeyError:
+            raise ValueError('Unknown transport: %s' % transport)
+    if callable(transport):
+        return CallableTransport(transport)
+    raise TypeError('Invalid transport: %r' % (transport,))
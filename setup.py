@@ -75,7 +75,7 @@ setup(
     tests_require=['pytest', 'mock'],
     test_suite='test',
     cmdclass={'test': PyTest},
-    install_requires=['requests>=0.13.3'],
+    install_requires=['requests>=1.0'],
     author_email='gabi@gabi.is',
     description=description,
     long_description=long_description,